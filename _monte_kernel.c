@@ -0,0 +1,386 @@
+/*
+ * Counts how many (x, y) points lie inside the unit circle, using
+ * AVX-512 or AVX2 + FMA to test 16 or 8 float32 points per instruction
+ * when the compiler targets them (falls back to a scalar loop otherwise).
+ *
+ * count_inside_pcg also generates the points itself, from 8 PCG32
+ * streams held in AVX2 registers, so they never go through memory.
+ *
+ * Built with: python setup.py build_ext --inplace
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <stdint.h>
+#include <string.h>
+
+#if defined(__AVX512F__) || (defined(__AVX2__) && defined(__FMA__))
+#include <immintrin.h>
+#endif
+
+#define PCG32_MULTIPLIER 6364136223846793005ULL
+
+/* The number of PCG32 streams used by count_inside_pcg */
+#define PCG_STREAMS 8
+
+
+#if defined(__AVX512F__)
+/* Tests 16 points at a time */
+#define VECTOR_WIDTH 16
+#define LOAD_ALIGNED _mm512_load_ps
+#define LOAD_UNALIGNED _mm512_loadu_ps
+
+static inline int
+count_vector(__m512 vx, __m512 vy)
+{
+    __m512 d = _mm512_fmadd_ps(vx, vx, _mm512_mul_ps(vy, vy));
+    return __builtin_popcount(
+        _mm512_cmp_ps_mask(d, _mm512_set1_ps(1.0f), _CMP_LT_OQ));
+}
+
+#elif defined(__AVX2__) && defined(__FMA__)
+/* Tests 8 points at a time */
+#define VECTOR_WIDTH 8
+#define LOAD_ALIGNED _mm256_load_ps
+#define LOAD_UNALIGNED _mm256_loadu_ps
+
+static inline int
+count_vector(__m256 vx, __m256 vy)
+{
+    __m256 d = _mm256_fmadd_ps(vx, vx, _mm256_mul_ps(vy, vy));
+    return __builtin_popcount(
+        _mm256_movemask_ps(_mm256_cmp_ps(d, _mm256_set1_ps(1.0f), _CMP_LT_OQ)));
+}
+#endif
+
+
+/* Counts the points in [lo, hi) with x*x + y*y < 1 */
+static int64_t
+count_range(const float *x, const float *y, Py_ssize_t lo, Py_ssize_t hi)
+{
+    int64_t hits = 0;
+    Py_ssize_t i = lo;
+
+#ifdef VECTOR_WIDTH
+    const uintptr_t vector_bytes = VECTOR_WIDTH * sizeof(float);
+
+    if ((uintptr_t)x % vector_bytes == (uintptr_t)y % vector_bytes) {
+        /* Tests points one at a time until x + i and y + i are
+         * aligned, so the rest can use aligned loads */
+        for (; i < hi && (uintptr_t)(x + i) % vector_bytes; i++) {
+            hits += (x[i] * x[i] + y[i] * y[i]) < 1.0f;
+        }
+        for (; i + VECTOR_WIDTH <= hi; i += VECTOR_WIDTH) {
+            hits += count_vector(LOAD_ALIGNED(x + i), LOAD_ALIGNED(y + i));
+        }
+    }
+    else {
+        for (; i + VECTOR_WIDTH <= hi; i += VECTOR_WIDTH) {
+            hits += count_vector(LOAD_UNALIGNED(x + i), LOAD_UNALIGNED(y + i));
+        }
+    }
+#endif
+
+    /* Scalar loop for whatever doesn't fill a vector */
+    for (; i < hi; i++) {
+        hits += (x[i] * x[i] + y[i] * y[i]) < 1.0f;
+    }
+
+    return hits;
+}
+
+
+/* Returns whether buf holds size byte items with one of the struct
+ * format codes in codes (in native byte order) */
+static int
+has_format(const Py_buffer *buf, const char *codes, Py_ssize_t size)
+{
+    const char *format = buf->format;
+    if (format[0] == '@' || format[0] == '=') {
+        format++;
+    }
+    return buf->itemsize == size && format[0] != '\0' && format[1] == '\0'
+        && strchr(codes, format[0]) != NULL;
+}
+
+
+static PyObject *
+count_inside(PyObject *self, PyObject *args)
+{
+    PyObject *x_obj, *y_obj, *out_obj;
+    Py_buffer x_buf = {NULL}, y_buf = {NULL}, out_buf = {NULL};
+    Py_ssize_t first, step;
+    PyObject *result = NULL;
+
+    if (!PyArg_ParseTuple(args, "OOOnn", &x_obj, &y_obj, &out_obj,
+                          &first, &step)) {
+        return NULL;
+    }
+
+    /* Requests the buffers' formats too, so that arrays of any other
+     * type are rejected rather than reinterpreted */
+    if (PyObject_GetBuffer(x_obj, &x_buf, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0
+            || PyObject_GetBuffer(y_obj, &y_buf,
+                                  PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0
+            || PyObject_GetBuffer(out_obj, &out_buf,
+                                  PyBUF_C_CONTIGUOUS | PyBUF_FORMAT
+                                  | PyBUF_WRITABLE) < 0) {
+        goto done;
+    }
+
+    if (!has_format(&x_buf, "f", sizeof(float))
+            || !has_format(&y_buf, "f", sizeof(float))) {
+        PyErr_SetString(PyExc_ValueError, "x and y must be float32");
+        goto done;
+    }
+    if (!has_format(&out_buf, "lq", sizeof(int64_t))) {
+        PyErr_SetString(PyExc_ValueError, "out must be int64");
+        goto done;
+    }
+    if (y_buf.len != x_buf.len) {
+        PyErr_SetString(PyExc_ValueError, "x and y must be the same length");
+        goto done;
+    }
+    if (first < 1 || step < 1) {
+        PyErr_SetString(PyExc_ValueError, "first and step must be positive");
+        goto done;
+    }
+
+    /* Only works out the number of segments once step is known to be
+     * positive (and without adding to n, so it can't overflow) */
+    Py_ssize_t n = x_buf.len / (Py_ssize_t)sizeof(float);
+    Py_ssize_t num_segments = 1;
+    if (n > first) {
+        num_segments += (n - first - 1) / step + 1;
+    }
+
+    if (out_buf.len < num_segments * (Py_ssize_t)sizeof(int64_t)) {
+        PyErr_SetString(PyExc_ValueError, "out is too small");
+        goto done;
+    }
+
+    const float *x = (const float *)x_buf.buf;
+    const float *y = (const float *)y_buf.buf;
+    int64_t *out = (int64_t *)out_buf.buf;
+    int64_t total = 0;
+
+    Py_BEGIN_ALLOW_THREADS
+    /* The first segment is [0, first), then every step after it */
+    Py_ssize_t lo = 0;
+    Py_ssize_t hi = first < n ? first : n;
+    for (Py_ssize_t k = 0; k < num_segments; k++) {
+        out[k] = count_range(x, y, lo, hi);
+        total += out[k];
+        lo = hi;
+        hi = hi + step < n ? hi + step : n;
+    }
+    Py_END_ALLOW_THREADS
+
+    result = PyLong_FromLongLong(total);
+
+done:
+    PyBuffer_Release(&x_buf);
+    PyBuffer_Release(&y_buf);
+    PyBuffer_Release(&out_buf);
+    return result;
+}
+
+
+/* PCG32 (XSH-RR), seeded as pcg32_srandom_r(seed, stream) */
+typedef struct {
+    uint64_t state;
+    uint64_t inc;
+} pcg32_state;
+
+
+static inline uint32_t
+pcg32_next(pcg32_state *rng)
+{
+    uint64_t old_state = rng->state;
+    rng->state = old_state * PCG32_MULTIPLIER + rng->inc;
+    uint32_t xorshifted = (uint32_t)(((old_state >> 18) ^ old_state) >> 27);
+    uint32_t rot = (uint32_t)(old_state >> 59);
+    return (xorshifted >> rot) | (xorshifted << ((-rot) & 31));
+}
+
+
+static void
+pcg32_seed(pcg32_state *rng, uint64_t seed, uint64_t stream)
+{
+    rng->state = 0;
+    rng->inc = (stream << 1) | 1;
+    pcg32_next(rng);
+    rng->state += seed;
+    pcg32_next(rng);
+}
+
+
+/* Returns a float in [0, 1) from the top 24 bits of a PCG32 output */
+static inline float
+pcg32_next_float(pcg32_state *rng)
+{
+    return (float)(pcg32_next(rng) >> 8) * (1.0f / 16777216.0f);
+}
+
+
+#if defined(__AVX2__) && defined(__FMA__)
+/* Multiplies each 64 bit lane of a by b (keeping the low 64 bits) */
+static inline __m256i
+mullo_epi64(__m256i a, __m256i b)
+{
+#if defined(__AVX512DQ__) && defined(__AVX512VL__)
+    return _mm256_mullo_epi64(a, b);
+#else
+    /* lo(a) * lo(b) + ((hi(a) * lo(b) + lo(a) * hi(b)) << 32) */
+    __m256i cross = _mm256_add_epi64(
+        _mm256_mul_epu32(_mm256_srli_epi64(a, 32), b),
+        _mm256_mul_epu32(a, _mm256_srli_epi64(b, 32)));
+    return _mm256_add_epi64(_mm256_mul_epu32(a, b),
+                            _mm256_slli_epi64(cross, 32));
+#endif
+}
+
+
+/* Advances 4 PCG32 streams, returning their outputs in the low 32
+ * bits of each 64 bit lane */
+static inline __m256i
+pcg32_next_x4(__m256i *state, __m256i inc)
+{
+    __m256i old_state = *state;
+    *state = _mm256_add_epi64(
+        mullo_epi64(old_state, _mm256_set1_epi64x(PCG32_MULTIPLIER)), inc);
+
+    __m256i xorshifted = _mm256_and_si256(
+        _mm256_srli_epi64(
+            _mm256_xor_si256(_mm256_srli_epi64(old_state, 18), old_state), 27),
+        _mm256_set1_epi64x(0xFFFFFFFF));
+    __m256i rot = _mm256_srli_epi64(old_state, 59);
+
+    /* Rotates right within the low 32 bits (the high bits of the
+     * left shift are masked off) */
+    __m256i rotated = _mm256_or_si256(
+        _mm256_srlv_epi64(xorshifted, rot),
+        _mm256_sllv_epi64(xorshifted,
+                          _mm256_sub_epi64(_mm256_set1_epi64x(32), rot)));
+    return _mm256_and_si256(rotated, _mm256_set1_epi64x(0xFFFFFFFF));
+}
+
+
+/* Advances all 8 streams, returning one float in [0, 1) from
+ * each (the even streams are in evens, the odd ones in odds, so
+ * stream k ends up in lane k) */
+static inline __m256
+pcg32_next_float_x8(__m256i *evens, __m256i *odds, __m256i even_inc,
+                    __m256i odd_inc)
+{
+    __m256i lo = pcg32_next_x4(evens, even_inc);
+    __m256i hi = pcg32_next_x4(odds, odd_inc);
+    __m256i bits = _mm256_or_si256(lo, _mm256_slli_epi64(hi, 32));
+
+    return _mm256_mul_ps(_mm256_cvtepi32_ps(_mm256_srli_epi32(bits, 8)),
+                         _mm256_set1_ps(1.0f / 16777216.0f));
+}
+#endif
+
+
+/* Counts how many of n points, taken from the PCG_STREAMS streams in
+ * turn (each giving an x and then a y), are inside the unit circle */
+static int64_t
+count_pcg(Py_ssize_t n, uint64_t seed)
+{
+    pcg32_state rngs[PCG_STREAMS];
+    for (int k = 0; k < PCG_STREAMS; k++) {
+        pcg32_seed(&rngs[k], seed, (uint64_t)k);
+    }
+
+    int64_t hits = 0;
+    Py_ssize_t i = 0;
+
+#if defined(__AVX2__) && defined(__FMA__)
+    __m256i evens = _mm256_setr_epi64x(rngs[0].state, rngs[2].state,
+                                       rngs[4].state, rngs[6].state);
+    __m256i odds = _mm256_setr_epi64x(rngs[1].state, rngs[3].state,
+                                      rngs[5].state, rngs[7].state);
+    __m256i even_inc = _mm256_setr_epi64x(rngs[0].inc, rngs[2].inc,
+                                          rngs[4].inc, rngs[6].inc);
+    __m256i odd_inc = _mm256_setr_epi64x(rngs[1].inc, rngs[3].inc,
+                                         rngs[5].inc, rngs[7].inc);
+
+    for (; i < n; i += PCG_STREAMS) {
+        __m256 vx = pcg32_next_float_x8(&evens, &odds, even_inc, odd_inc);
+        __m256 vy = pcg32_next_float_x8(&evens, &odds, even_inc, odd_inc);
+        __m256 d = _mm256_fmadd_ps(vx, vx, _mm256_mul_ps(vy, vy));
+        int mask = _mm256_movemask_ps(
+            _mm256_cmp_ps(d, _mm256_set1_ps(1.0f), _CMP_LT_OQ));
+
+        /* Ignores the streams past the last point */
+        if (n - i < PCG_STREAMS) {
+            mask &= (1 << (n - i)) - 1;
+        }
+        hits += __builtin_popcount(mask);
+    }
+#else
+    for (; i < n; i += PCG_STREAMS) {
+        for (int k = 0; k < PCG_STREAMS && i + k < n; k++) {
+            float x = pcg32_next_float(&rngs[k]);
+            float y = pcg32_next_float(&rngs[k]);
+            hits += (x * x + y * y) < 1.0f;
+        }
+    }
+#endif
+
+    return hits;
+}
+
+
+static PyObject *
+count_inside_pcg(PyObject *self, PyObject *args)
+{
+    Py_ssize_t n;
+    unsigned long long seed;
+
+    if (!PyArg_ParseTuple(args, "nK", &n, &seed)) {
+        return NULL;
+    }
+    if (n < 0) {
+        PyErr_SetString(PyExc_ValueError, "n must not be negative");
+        return NULL;
+    }
+
+    int64_t hits;
+
+    Py_BEGIN_ALLOW_THREADS
+    hits = count_pcg(n, (uint64_t)seed);
+    Py_END_ALLOW_THREADS
+
+    return PyLong_FromLongLong(hits);
+}
+
+
+static PyMethodDef monte_kernel_methods[] = {
+    {"count_inside", count_inside, METH_VARARGS,
+     "count_inside(x, y, out, first, step)\n\n"
+     "Counts the float32 points (x, y) inside the unit circle, writing\n"
+     "the counts for [0, first), [first, first + step), ... into the\n"
+     "int64 buffer out and returning the total."},
+    {"count_inside_pcg", count_inside_pcg, METH_VARARGS,
+     "count_inside_pcg(n, seed)\n\n"
+     "Counts how many of n float32 points, generated in turn from 8 PCG32\n"
+     "streams seeded with seed, are inside the unit circle."},
+    {NULL, NULL, 0, NULL},
+};
+
+
+static struct PyModuleDef monte_kernel_module = {
+    PyModuleDef_HEAD_INIT,
+    "_monte_kernel",
+    "SIMD kernel for the Monte-Carlo calculation of pi",
+    -1,
+    monte_kernel_methods,
+};
+
+
+PyMODINIT_FUNC
+PyInit__monte_kernel(void)
+{
+    return PyModule_Create(&monte_kernel_module);
+}
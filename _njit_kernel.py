@@ -0,0 +1,67 @@
+"""
+The kernel used by calculating_pi_njit.py, kept as a plain Python
+function (with no eager JIT signature) so that setup.py can
+ahead-of-time compile it into calc_pi_aot without importing the
+script, and so without JIT compiling the parallel version at
+build time
+"""
+
+import numpy as np
+from numba import prange
+
+# The number of samples handled by each parallel block
+BLOCK_SIZE = 1 << 16
+
+
+def calc_pi_kernel(num_samples, seed):
+    """
+    The compiled part of calculating_pi_njit.calc_pi, which
+    splits num_samples into blocks of BLOCK_SIZE samples, and
+    returns the calculated value of pi
+    """
+    num_blocks = -(-num_samples // BLOCK_SIZE)
+
+    # Sets the initial amount of points in the circle to 0
+    # (as an unsigned integer, since it can never be negative)
+    num_in_circle = np.uint64(0)
+
+    # Shares the blocks out between the threads, with numba
+    # summing each thread's count into num_in_circle
+    for block in prange(num_blocks):
+        # Sets the RNG's seed for the thread running this block
+        # (each thread has its own RNG state) from a SplitMix64
+        # step over seed and the block's index, rather than seed +
+        # block, which would give neighbouring seeds the same
+        # streams for all but one of their blocks
+        z = np.uint64(seed) + np.uint64(block + 1) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        np.random.seed(np.uint32((z ^ (z >> np.uint64(31))) >> np.uint64(32)))
+
+        start = block * BLOCK_SIZE
+        end = min(start + BLOCK_SIZE, num_samples)
+
+        block_in_circle = np.uint64(0)
+
+        for _ in range(start, end):
+            # Generates 2 uniformly pseudo-randomly distributed
+            # numbers which represent a 2D point inside the unit
+            # circle.
+            # (single precision is plenty for this test and
+            # halves the size of each number)
+            x = np.float32(np.random.random())
+            y = np.float32(np.random.random())
+
+            # Checks if those points are inside the unit circle
+            # by finding the square magnitude of the vector
+            # (there's no point finding the sqrt as numbers < 1
+            # will remain < 1, and numbers > 1 will remain > 1),
+            # adding the result of the comparison rather than
+            # branching on it
+            block_in_circle += np.uint64(x * x + y * y < np.float32(1.0))
+
+        num_in_circle += block_in_circle
+
+    pi = 4 * num_in_circle / num_samples
+
+    return pi
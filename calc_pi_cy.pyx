@@ -0,0 +1,99 @@
+# cython: language_level=3
+"""
+Ahead-of-time compiled Monte-Carlo kernel for calculating pi
+
+Build it in place with:
+    python setup.py build_ext --inplace
+"""
+import numpy as np
+
+cimport cython
+from libc.stdint cimport uint32_t, uint64_t
+
+
+# State of a PCG32 (XSH-RR) random number generator
+cdef struct pcg32_state:
+    uint64_t state
+    uint64_t inc
+
+
+cdef inline uint32_t pcg32_next(pcg32_state *rng) noexcept nogil:
+    # Advances the generator and permutes the old state into
+    # a 32 bit output
+    cdef uint64_t old_state = rng.state
+    rng.state = old_state * 6364136223846793005ULL + rng.inc
+    cdef uint32_t xorshifted = <uint32_t>(((old_state >> 18) ^ old_state) >> 27)
+    cdef uint32_t rot = <uint32_t>(old_state >> 59)
+    return (xorshifted >> rot) | (xorshifted << ((-rot) & 31))
+
+
+cdef inline void pcg32_seed(pcg32_state *rng, uint64_t seed) noexcept nogil:
+    rng.state = 0
+    rng.inc = 1442695040888963407ULL
+    pcg32_next(rng)
+    rng.state += seed
+    pcg32_next(rng)
+
+
+cdef inline float pcg32_next_float(pcg32_state *rng) noexcept nogil:
+    # Returns a uniformly distributed float in [0, 1) using the
+    # top 24 bits (all a float's mantissa can hold exactly)
+    return <float>(pcg32_next(rng) >> 8) * <float>(1.0 / 16777216.0)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef long _calc(long n, uint64_t seed, long rate, double[::1] out) noexcept nogil:
+    cdef pcg32_state state
+    cdef float x, y
+    cdef long i, interval, num_points
+    cdef long hits = 0
+    cdef long num_intervals = n // rate
+
+    pcg32_seed(&state, seed)
+
+    # Runs each interval between storing the current value of
+    # pi as its own loop, so there's no modulo or branch per point
+    for interval in range(num_intervals + 1):
+        num_points = min(rate, n - interval * rate)
+
+        for i in range(num_points):
+            x = pcg32_next_float(&state)
+            y = pcg32_next_float(&state)
+
+            # Checks if the point is inside the unit circle by finding
+            # the square magnitude of the vector (adding the result
+            # of the comparison rather than branching on it)
+            hits += x * x + y * y < <float>1.0
+
+        if interval < num_intervals:
+            out[interval] = 4.0 * hits / ((interval + 1) * rate)
+
+    return hits
+
+
+def calc_pi(num_samples=1e5, seed=12345, pi_collection_rate=1e3):
+    """
+    Calculates pi using a Monte-Carlo approach in compiled C
+
+    num_samples = Specifies how many data points are sampled
+    seed        = Specifies the random number generator's
+                  seed so that the results are repeatable
+    pi_collection_rate = The amount of iterations between
+                  storing the current value of pi
+
+    Returns the final value of pi and the stored values of pi
+    """
+    cdef long n = int(num_samples)
+    cdef long rate = int(pi_collection_rate)
+    cdef uint64_t c_seed = seed
+    cdef long hits
+
+    pi_values = np.zeros(n // rate)
+    cdef double[::1] out = pi_values
+
+    with nogil:
+        hits = _calc(n, c_seed, rate, out)
+
+    return 4 * hits / num_samples, pi_values
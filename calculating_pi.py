@@ -1,9 +1,35 @@
 import numpy as np
+import sys
 import unittest
-from numba import njit
+from numba import literally, njit, prange
 
+try:
+    # Built with: python setup.py build_ext --inplace
+    from _monte_kernel import count_inside, count_inside_pcg
+except ImportError:
+    count_inside = count_inside_pcg = None
 
-def calc_pi_serial(num_samples=1e5, seed=12345, pi_collection_rate=1e3):
+try:
+    from scipy.stats import qmc
+except ImportError:
+    qmc = None
+
+# The number of samples which are generated and checked at a
+# time by calc_pi_serial and calc_pi_qmc (small enough to stay
+# in the cache, and a power of 2, so every chunk is a balanced
+# part of the Sobol sequence)
+CHUNK_SIZE = 1 << 20
+
+# The number of samples (rounded to a whole number of pi
+# collection intervals) handled by each parallel block in calc_pi
+BLOCK_SIZE = 1 << 16
+
+# The number of independent RNG streams which each block in
+# calc_pi takes its samples from in turn
+NUM_STREAMS = 4
+
+
+def calc_pi_serial(num_samples=1e5, seed=12345, pi_collection_rate=1e3, use_simd=False):
     """
     Implements a serial processing Monte-Carlo approach to
     calculate pi
@@ -21,36 +47,314 @@ def calc_pi_serial(num_samples=1e5, seed=12345, pi_collection_rate=1e3):
                   seed reproducable
     pi_collection_rate = The amount of iterations between
                   storing the current value of pi
+    use_simd    = Specifies whether to test the points with the
+                  compiled SIMD kernel (needs _monte_kernel to be
+                  built), which gives the same points, but stores
+                  them a chunk at a time
+    """
+    if use_simd and count_inside is None:
+        raise ImportError("calc_pi_serial's use_simd needs _monte_kernel to be built")
+
+    n = int(num_samples)
+    step = int(pi_collection_rate)
+
+    # Sets the RNG's seed (uses the PCG64DXSM generator, which is
+    # faster than the legacy np.random.seed Mersenne Twister and
+    # has better statistical properties than default_rng's PCG64),
+    # with separate streams for the x and y coordinates so that
+    # the points don't depend on how they're split into chunks
+    rng_x, rng_y = [
+        np.random.Generator(np.random.PCG64DXSM(stream))
+        for stream in np.random.SeedSequence(seed).spawn(2)
+    ]
+
+    if use_simd:
+        interval_hits = _count_inside_chunked(rng_x, rng_y, n, step)
+    else:
+        # Generates and checks the points one at a time in a
+        # single compiled loop, so they never have to be stored
+        # in memory
+        interval_hits = _count_inside_serial(rng_x, rng_y, n, step)
+
+    # Stores the value of pi after every pi_collection_rate
+    # samples using the running total of points in the circle
+    num_pi_values = n // step
+    pi_values = (
+        4
+        * np.cumsum(interval_hits[:num_pi_values])
+        / (np.arange(1, num_pi_values + 1) * step)
+    )
+
+    pi = 4 * interval_hits.sum() / num_samples
+
+    return pi, pi_values
+
+
+def _count_inside_chunked(rng_x, rng_y, n, step):
+    """
+    Counts how many of n points (drawn from the NumPy Generators
+    rng_x and rng_y) are inside the unit circle, for each
+    interval of step points (the final entry is for any points
+    after the last interval), a chunk at a time using the
+    compiled SIMD kernel
+    """
+    # Stores the amount of points in the circle for each interval
+    # between storing the current value of pi
+    interval_hits = np.zeros(n // step + 1, dtype=np.int64)
+
+    # Scratch buffers which are reused by every chunk, so that
+    # only CHUNK_SIZE points are held in memory at any one time
+    chunk_size = min(CHUNK_SIZE, n)
+    x = _aligned_empty(chunk_size, np.float32)
+    y = _aligned_empty(chunk_size, np.float32)
+    segment_hits = np.empty(chunk_size // step + 2, dtype=np.int64)
+
+    # Takes a number of samples = n, a chunk at a time
+    for start in range(0, n, chunk_size):
+        m = min(chunk_size, n - start)
+
+        # Generates the chunk's 2d points in one go rather than
+        # one at a time, as the per-call overhead dominates
+        rng_x.random(dtype=np.float32, out=x[:m])
+        rng_y.random(dtype=np.float32, out=y[:m])
+
+        # Counts the points in the circle for each part of the
+        # chunk that falls within a different interval
+        first = step - start % step
+        num_segments = 1 + max(0, -(-(m - first) // step))
+        count_inside(x[:m], y[:m], segment_hits, first, step)
+
+        first_interval = start // step
+        interval_hits[first_interval : first_interval + num_segments] += segment_hits[
+            :num_segments
+        ]
+
+    return interval_hits
+
+
+def _aligned_empty(n, dtype, alignment=64):
+    """
+    Returns an uninitialised array of n elements whose data
+    starts on an alignment byte boundary, so that SIMD code can
+    use aligned loads on it
+    """
+    itemsize = np.dtype(dtype).itemsize
+    buffer = np.empty(n * itemsize + alignment, dtype=np.uint8)
+    offset = -buffer.ctypes.data % alignment
+
+    return buffer[offset : offset + n * itemsize].view(dtype)
+
+
+@njit(cache=True, fastmath=True)
+def _count_inside_serial(rng_x, rng_y, n, step):
+    """
+    Numba version of _count_inside_chunked, which draws each
+    point from the NumPy Generators rng_x and rng_y and tests
+    it straight away
+    """
+    num_pi_values = n // step
+    interval_hits = np.zeros(num_pi_values + 1, dtype=np.int64)
+
+    for interval in range(num_pi_values + 1):
+        num_points = min(step, n - interval * step)
+
+        # Sets the initial amount of points in the circle to 0
+        num_in_circle = 0
+
+        for _ in range(num_points):
+            # Generates 2 uniformly pseudo-randomly distributed
+            # numbers which represent a 2D point inside the unit
+            # circle.
+            x = rng_x.random(dtype=np.float32)
+            y = rng_y.random(dtype=np.float32)
+
+            # Checks if those points are inside the unit circle
+            # by finding the square magnitude of the vector,
+            # adding the result of the comparison rather than
+            # branching on it
+            num_in_circle += np.int64(x * x + y * y < np.float32(1.0))
+
+        interval_hits[interval] = num_in_circle
+
+    return interval_hits
+
+
+@njit(cache=True, inline="always")
+def _rotl(x, k):
+    """
+    Rotates the bits of the 64 bit unsigned integer x left by k
+    """
+    return (x << np.uint64(k)) | (x >> np.uint64(64 - k))
+
+
+@njit(cache=True)
+def _seed_xoshiro(state, seed, stream):
+    """
+    Seeds the xoshiro256+ state (4 uint64s) for the given stream
+    with consecutive outputs of a SplitMix64 generator started
+    from seed, so that every stream gets a different state
+    """
+    z = np.uint64(seed) + np.uint64(4 * stream) * np.uint64(0x9E3779B97F4A7C15)
+
+    for i in range(4):
+        z += np.uint64(0x9E3779B97F4A7C15)
+        r = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        r = (r ^ (r >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        state[i] = r ^ (r >> np.uint64(31))
+
+
+@njit(cache=True, inline="always")
+def _xoshiro_next(s0, s1, s2, s3):
+    """
+    Advances a xoshiro256+ generator, returning 2 uniformly
+    distributed float32s in [0, 1) and the new state
+    """
+    r = s0 + s3
+
+    # Splits the 64 bit output into the top 24 bits of each half
+    # (all a float's mantissa can hold exactly, and skipping the
+    # lowest bits, which are xoshiro256+'s weakest)
+    scale = np.float32(1.0 / (1 << 24))
+    u = np.float32(np.uint32(r >> np.uint64(40))) * scale
+    v = np.float32(np.uint32((r >> np.uint64(8)) & np.uint64(0xFFFFFF))) * scale
+
+    t = s1 << np.uint64(17)
+    s2 ^= s0
+    s3 ^= s1
+    s1 ^= s2
+    s0 ^= s3
+    s2 ^= t
+    s3 = _rotl(s3, 45)
+
+    return u, v, s0, s1, s2, s3
+
+
+@njit(cache=True, inline="always")
+def _is_inside(x, y):
     """
-    # Sets the RNG's seed
-    np.random.seed(seed)
+    Returns 1 if the point (x, y) is inside the unit circle
+    and 0 otherwise
+    """
+    # Finds the square magnitude of the vector (there's no point
+    # finding the sqrt as numbers < 1 will remain < 1, and
+    # numbers > 1 will remain > 1), returning the result of the
+    # comparison rather than branching on it
+    return np.int64(x * x + y * y < np.float32(1.0))
+
+
+@njit(cache=True, fastmath=True)
+def _count_inside(state, num_points):
+    """
+    Counts how many of num_points uniformly pseudo-randomly
+    generated 2d points are inside the unit circle (using and
+    advancing the NUM_STREAMS xoshiro256+ RNG states in the rows
+    of state)
+    """
+    # Keeps the RNGs' states in local variables while sampling,
+    # rather than reading and writing the array for every number
+    a0, a1, a2, a3 = state[0, 0], state[0, 1], state[0, 2], state[0, 3]
+    b0, b1, b2, b3 = state[1, 0], state[1, 1], state[1, 2], state[1, 3]
+    c0, c1, c2, c3 = state[2, 0], state[2, 1], state[2, 2], state[2, 3]
+    d0, d1, d2, d3 = state[3, 0], state[3, 1], state[3, 2], state[3, 3]
 
     # Sets the initial amount of points in the circle to 0
     num_in_circle = 0
 
-    # Stores previous values of pi
-    pi_values = np.zeros(int(num_samples // pi_collection_rate))
-    num_pi_stored = 0
+    # Takes a point from each stream per iteration, as each
+    # stream's next number depends on its last one, but the
+    # streams are independent so their work can overlap
+    for _ in range(num_points // NUM_STREAMS):
+        # Generates 2 uniformly pseudo-randomly distributed
+        # numbers per stream (from a single step of each) which
+        # represent 2D points inside the unit circle.
+        # (single precision is plenty for this test and
+        # halves the size of each number)
+        xa, ya, a0, a1, a2, a3 = _xoshiro_next(a0, a1, a2, a3)
+        xb, yb, b0, b1, b2, b3 = _xoshiro_next(b0, b1, b2, b3)
+        xc, yc, c0, c1, c2, c3 = _xoshiro_next(c0, c1, c2, c3)
+        xd, yd, d0, d1, d2, d3 = _xoshiro_next(d0, d1, d2, d3)
 
-    # Takes a number of samples = num_samples
-    for i in range(1, int(num_samples) + 1):
-        # Checks if the randomly generated 2d point is inside
-        # the unit circle finding the magnitude of the vector
-        if np.linalg.norm(np.random.rand(2)) < 1:
-            num_in_circle += 1
+        # Checks if those points are inside the unit circle
+        num_in_circle += (
+            _is_inside(xa, ya)
+            + _is_inside(xb, yb)
+            + _is_inside(xc, yc)
+            + _is_inside(xd, yd)
+        )
 
-        # Checks if current number of iterations is a multiple
-        # of the pi_collection_rate
-        if i % pi_collection_rate == 0:
-            pi_values[num_pi_stored] = 4 * num_in_circle / i
-            num_pi_stored += 1
+    # Takes any remaining points from the first stream
+    for _ in range(num_points % NUM_STREAMS):
+        x, y, a0, a1, a2, a3 = _xoshiro_next(a0, a1, a2, a3)
 
-    pi = 4 * num_in_circle / num_samples
+        num_in_circle += _is_inside(x, y)
+
+    state[0, 0], state[0, 1], state[0, 2], state[0, 3] = a0, a1, a2, a3
+    state[1, 0], state[1, 1], state[1, 2], state[1, 3] = b0, b1, b2, b3
+    state[2, 0], state[2, 1], state[2, 2], state[2, 3] = c0, c1, c2, c3
+    state[3, 0], state[3, 1], state[3, 2], state[3, 3] = d0, d1, d2, d3
+
+    return num_in_circle
+
+
+@njit(cache=True, parallel=True, fastmath=True)
+def _calc_pi_kernel(n, seed, step):
+    """
+    The compiled part of calc_pi, which is specialised for each
+    value of step, so the length of every interval between
+    storing the current value of pi is a compile time constant
+    """
+    literally(step)
+
+    # The number of stored values of pi
+    num_pi_values = n // step
+
+    # Each block holds a whole number of the intervals between
+    # storing the current value of pi
+    intervals_per_block = max(1, BLOCK_SIZE // step)
+    num_blocks = -(-n // (intervals_per_block * step))
+
+    # Stores the amount of points in the circle for each interval
+    # (the final entry is for any samples after the last interval)
+    interval_hits = np.zeros(num_pi_values + 1, dtype=np.int64)
+
+    # Gives each block its own RNGs, rather than sharing numba's
+    # np.random state
+    states = np.empty((num_blocks, NUM_STREAMS, 4), dtype=np.uint64)
+
+    for block in prange(num_blocks):
+        # Sets the RNGs' seeds for this block
+        state = states[block]
+        for stream in range(NUM_STREAMS):
+            _seed_xoshiro(state[stream], seed, block * NUM_STREAMS + stream)
+
+        first_interval = block * intervals_per_block
+        last_interval = min(first_interval + intervals_per_block, num_pi_values)
+
+        for interval in range(first_interval, last_interval):
+            interval_hits[interval] = _count_inside(state, step)
+
+        # The last block also takes any samples after the last
+        # interval
+        if block == num_blocks - 1:
+            interval_hits[num_pi_values] = _count_inside(
+                state, n - num_pi_values * step
+            )
+
+    # Stores the value of pi after every pi_collection_rate
+    # samples using the running total of points in the circle
+    pi_values = (
+        4
+        * np.cumsum(interval_hits[:num_pi_values])
+        / (np.arange(1, num_pi_values + 1) * step)
+    )
+
+    # Uses the ratio of points in the unit circle to total
+    # number of points to get a value for pi
+    pi = 4 * interval_hits.sum() / n
 
     return pi, pi_values
 
 
-@njit
 def calc_pi(num_samples=1e5, seed=12345, pi_collection_rate=1e3):
     """
     Implements a parallel processing Monte-Carlo approach to
@@ -63,6 +367,14 @@ def calc_pi(num_samples=1e5, seed=12345, pi_collection_rate=1e3):
     the number of points in the circle to the total amount
     of points sampled to get a value of pi
 
+    The samples are split into blocks which are shared out
+    between the available threads, with each block using its
+    own xoshiro256+ RNGs seeded from seed and the block's
+    index, so the results don't depend on the number of threads
+
+    The first call with each pi_collection_rate compiles a
+    version of the kernel specialised for it
+
     num_samples = Specifies how many data points are sampled
     seed        = Specifies the random number generator's
                   so that the results are repeatable and
@@ -70,42 +382,77 @@ def calc_pi(num_samples=1e5, seed=12345, pi_collection_rate=1e3):
     pi_collection_rate = The amount of iterations between
                   storing the current value of pi
     """
-    # Sets the RNG's seed
-    np.random.seed(seed)
+    return _calc_pi_kernel(int(num_samples), seed, int(pi_collection_rate))
+
+
+def calc_pi_qmc(num_samples=2**17, seed=12345):
+    """
+    Implements a quasi-Monte-Carlo approach to calculate pi
+    (needs scipy)
+
+    i.e. it works the same way as calc_pi_serial, but uses a
+    scrambled 2d Sobol sequence rather than pseudo-random
+    points, which covers the unit square more evenly so the
+    calculated value of pi converges faster than 1/sqrt(N)
+
+    num_samples = Specifies how many data points are sampled
+                  (this must be a power of 2, so that the
+                  Sobol sequence stays balanced)
+    seed        = Specifies the random number generator's
+                  so that the results are repeatable and
+                  seed reproducable
+    """
+    if qmc is None:
+        raise ImportError("calc_pi_qmc needs scipy to be installed")
+
+    n = int(num_samples)
+    if n < 1 or n & (n - 1):
+        raise ValueError("num_samples must be a power of 2")
+
+    # Sets the scrambling's seed
+    engine = qmc.Sobol(d=2, scramble=True, seed=seed)
 
     # Sets the initial amount of points in the circle to 0
     num_in_circle = 0
 
-    # Stores previous values of pi
-    pi_values = np.zeros(int(num_samples // pi_collection_rate))
-    num_pi_stored = 0
+    # Takes the points a chunk at a time
+    chunk_size = min(CHUNK_SIZE, n)
+    for _ in range(n // chunk_size):
+        xy = engine.random(chunk_size)
 
-    # Takes a number of samples = num_samples
-    for i in range(1, int(num_samples) + 1):
-        # Generates 2 uniformly pseudo-randomly distributed
-        # numbers which represent a 2D point inside the unit
-        # circle.
-        x = np.random.rand()
-        y = np.random.rand()
+        # Checks if the points are inside the unit circle by
+        # finding the square magnitude of each vector
+        num_in_circle += np.count_nonzero(np.einsum("ij,ij->i", xy, xy) < 1.0)
 
-        # Checks if those points are inside the unit circle
-        # by finding the square magnitude of the vector
-        # (there's no point finding the sqrt as numbers < 1
-        # will remain < 1, and numbers > 1 will remain > 1)
-        if (x**2 + y**2) < 1:
-            num_in_circle += 1
-
-        # Checks if current number of iterations is a multiple
-        # of the pi_collection_rate
-        if i % pi_collection_rate == 0:
-            pi_values[num_pi_stored] = 4 * num_in_circle / i
-            num_pi_stored += 1
+    pi = 4 * num_in_circle / n
+
+    return pi
+
+
+def calc_pi_pcg(num_samples=1e5, seed=12345):
+    """
+    Implements a serial processing Monte-Carlo approach to
+    calculate pi entirely in the compiled SIMD kernel (needs
+    _monte_kernel to be built)
+
+    i.e. it works the same way as calc_pi_serial, but the
+    points are generated 8 at a time from 8 PCG32 streams held
+    in AVX2 registers and tested straight away, so they're
+    never written to memory
+
+    num_samples = Specifies how many data points are sampled
+    seed        = Specifies the random number generator's
+                  so that the results are repeatable and
+                  seed reproducable
+    """
+    if count_inside_pcg is None:
+        raise ImportError("calc_pi_pcg needs _monte_kernel to be built")
+
+    num_in_circle = count_inside_pcg(int(num_samples), seed)
 
-    # Uses the ratio of points in the unit circle to total
-    # number of points to get a value for pi
     pi = 4 * num_in_circle / num_samples
 
-    return pi, pi_values
+    return pi
 
 
 def display_difference(original_value, new_value):
@@ -188,11 +535,132 @@ class Test_Pi_Calculation(unittest.TestCase):
         pi3, _ = calc_pi(num_samples=1000, seed=123)
         pi4, _ = calc_pi(num_samples=1000, seed=123)
 
-        # Testing that all values of returned pi are equal
+        # Testing that the values of returned pi are equal
+        # (calc_pi_serial uses a different RNG to calc_pi, so
+        # the two functions are only compared to themselves)
         self.assertEqual(pi1, pi2)
-        self.assertEqual(pi2, pi3)
         self.assertEqual(pi3, pi4)
 
+    def test_calc_pi_values_match_final(self):
+        """
+        Tests that the last stored value of pi matches the final
+        value of pi when num_samples is a multiple of the
+        pi_collection_rate
+        """
+        pi, pi_values = calc_pi_serial(
+            num_samples=10000, seed=7, pi_collection_rate=500
+        )
+        self.assertAlmostEqual(pi_values[-1], pi)
+
+    def test_calc_pi_serial_points(self):
+        """
+        Tests that calc_pi_serial stores the right values of pi
+        for the points drawn from its RNGs, both with numba and
+        with the SIMD kernel (when the pi_collection_rate doesn't
+        divide its chunks)
+        """
+        global CHUNK_SIZE
+        original_chunk_size = CHUNK_SIZE
+
+        results = [calc_pi_serial(num_samples=10003, seed=3, pi_collection_rate=500)]
+
+        if count_inside is not None:
+            try:
+                CHUNK_SIZE = 777
+                results.append(
+                    calc_pi_serial(
+                        num_samples=10003,
+                        seed=3,
+                        pi_collection_rate=500,
+                        use_simd=True,
+                    )
+                )
+            finally:
+                CHUNK_SIZE = original_chunk_size
+
+        # Recreates the same points with NumPy
+        rng_x, rng_y = [
+            np.random.Generator(np.random.PCG64DXSM(stream))
+            for stream in np.random.SeedSequence(3).spawn(2)
+        ]
+        x = rng_x.random(10003, dtype=np.float32)
+        y = rng_y.random(10003, dtype=np.float32)
+        running_total = np.cumsum(x * x + y * y < 1.0)
+
+        for pi, pi_values in results:
+            self.assertEqual(pi, 4 * running_total[-1] / 10003)
+            np.testing.assert_allclose(
+                pi_values,
+                4 * running_total[499:10000:500] / np.arange(500, 10001, 500),
+            )
+
+    def test_calc_pi_serial_simd_missing(self):
+        """
+        Tests that calc_pi_serial says _monte_kernel is needed
+        when asked to use the SIMD kernel without it
+        """
+        global count_inside
+        original_count_inside = count_inside
+
+        try:
+            count_inside = None
+            with self.assertRaises(ImportError):
+                calc_pi_serial(num_samples=1000, use_simd=True)
+        finally:
+            count_inside = original_count_inside
+
+    def test_aligned_empty(self):
+        """
+        Tests that _aligned_empty returns aligned arrays of the
+        requested size and type
+        """
+        for n in (1, 100, 12345):
+            array = _aligned_empty(n, np.float32)
+
+            self.assertEqual(array.ctypes.data % 64, 0)
+            self.assertEqual(array.shape, (n,))
+            self.assertEqual(array.dtype, np.float32)
+
+    @unittest.skipIf(count_inside is None, "_monte_kernel hasn't been built")
+    def test_count_inside(self):
+        """
+        Tests that the compiled SIMD kernel counts the same points
+        as NumPy for each segment
+        """
+        rng = np.random.default_rng(11)
+        x = rng.random(1003, dtype=np.float32)
+        y = rng.random(1003, dtype=np.float32)
+        out = np.zeros(12, dtype=np.int64)
+
+        total = count_inside(x, y, out, 37, 100)
+
+        inside = x * x + y * y < 1.0
+        expected = np.add.reduceat(inside, np.r_[0, np.arange(37, 1003, 100)])
+        self.assertEqual(total, inside.sum())
+        np.testing.assert_array_equal(out[: len(expected)], expected)
+
+    @unittest.skipIf(count_inside is None, "_monte_kernel hasn't been built")
+    def test_count_inside_invalid(self):
+        """
+        Tests that the compiled SIMD kernel rejects segment sizes
+        which aren't positive, rather than dividing by them, and
+        arrays of the wrong type
+        """
+        x = np.zeros(10, dtype=np.float32)
+        out = np.zeros(20, dtype=np.int64)
+
+        with self.assertRaises(ValueError):
+            count_inside(x, x, out, 1, 0)
+        with self.assertRaises(ValueError):
+            count_inside(x, x, out, 0, 1)
+
+        # Arrays of any other type are rejected rather than read
+        # as float32 or int64
+        with self.assertRaises(ValueError):
+            count_inside(np.full(8, 0.5), np.full(8, 0.5), out, 1, 2)
+        with self.assertRaises(ValueError):
+            count_inside(x, x, out.astype(np.int32), 1, 2)
+
     def test_calc_pi_collection_rate(self):
         """
         Tests that pi_values has correct length based on collection rate
@@ -211,14 +679,52 @@ class Test_Pi_Calculation(unittest.TestCase):
         )
         self.assertEqual(len(pi_values), expected_length)
 
+    @unittest.skipIf(count_inside_pcg is None, "_monte_kernel hasn't been built")
+    def test_calc_pi_pcg(self):
+        """
+        Tests that calc_pi_pcg is repeatable and that the points
+        don't depend on how many are taken
+        """
+        pi1 = calc_pi_pcg(num_samples=1000, seed=123)
+        pi2 = calc_pi_pcg(num_samples=1000, seed=123)
+
+        self.assertTrue(2.5 < pi1 < 4.0)
+        self.assertEqual(pi1, pi2)
+
+        # The first 1000 of 1003 points are the same as above
+        extra = count_inside_pcg(1003, 123) - count_inside_pcg(1000, 123)
+        self.assertIn(extra, range(4))
+
+    @unittest.skipIf(qmc is None, "scipy isn't installed")
+    def test_calc_pi_qmc(self):
+        """
+        Tests that calc_pi_qmc is repeatable, closer to pi than
+        the Monte-Carlo error for the same number of samples, and
+        only accepts powers of 2
+        """
+        pi1 = calc_pi_qmc(num_samples=2**16, seed=123)
+        pi2 = calc_pi_qmc(num_samples=2**16, seed=123)
+
+        self.assertEqual(pi1, pi2)
+        self.assertLess(abs(pi1 - np.pi), 2e-3)
+
+        with self.assertRaises(ValueError):
+            calc_pi_qmc(num_samples=1000)
+
 
 def parallel_vs_serial_benchmark():
     """
     Times the difference between the calc_pi with and without
-    parallelisation (using njit)
+    parallelisation (using njit), and the serial version without
+    numba (using the SIMD kernel, if it has been built)
     """
     import time
 
+    # Compiles the numba functions first, so that only the
+    # calculations themselves are timed
+    calc_pi(1000)
+    calc_pi_serial(1000)
+
     start = time.time()
     calc_pi(1e7)
     print("With Numba:", time.time() - start)
@@ -226,7 +732,13 @@ def parallel_vs_serial_benchmark():
     start = time.time()
     calc_pi_serial(1e7)
 
-    print("Without Numba:", time.time() - start)
+    print("In serial:", time.time() - start)
+
+    if count_inside is not None:
+        start = time.time()
+        calc_pi_serial(1e7, use_simd=True)
+
+        print("Without Numba:", time.time() - start)
 
 
 if __name__ == "__main__":
@@ -251,9 +763,12 @@ if __name__ == "__main__":
     # Outputs the results to the console
     output_results(pi, pi_values, num_samples, seed, pi_collection_rate)
 
-    # Run the unit tests
-    print("\nRunning unit tests...")
-    unittest.main()
+    # Run the unit tests (only when asked to with --test, so
+    # that benchmarking runs don't redo the work for every test)
+    if "--test" in sys.argv:
+        sys.argv.remove("--test")
+        print("\nRunning unit tests...")
+        unittest.main()
 
     # Alternative unittest syntaxes #
 
@@ -0,0 +1,280 @@
+import numpy as np
+import os
+import sys
+import unittest
+from numba import config, cuda
+from numba.cuda.random import (
+    create_xoroshiro128p_states,
+    xoroshiro128p_uniform_float32,
+)
+import time
+
+# The number of GPU threads in each block, the most blocks
+# launched, and the number of samples each thread takes at a
+# time (enough that the cost of setting up each thread and
+# reducing its count is small in comparison)
+THREADS_PER_BLOCK = 256
+MAX_BLOCKS = 1024
+SAMPLES_PER_THREAD = 1024
+
+# The number of threads in a warp, and the mask for shuffling
+# values between all of them
+WARP_SIZE = 32
+FULL_MASK = 0xFFFFFFFF
+
+
+@cuda.jit
+def count_inside_kernel(rng_states, num_samples, counter):
+    """
+    Counts how many uniformly pseudo-randomly generated 2d
+    points are inside the unit circle, with each thread
+    using its own RNG state for SAMPLES_PER_THREAD points
+    at a time, and each block adding its threads' total to
+    counter
+    """
+    thread_id = cuda.grid(1)
+
+    # Sets the initial amount of points in the circle to 0
+    num_in_circle = 0
+
+    # Strides over the grid a SAMPLES_PER_THREAD sized tile at a
+    # time, so the number of threads (and so of RNG states)
+    # doesn't grow with num_samples
+    tile_stride = cuda.gridsize(1) * SAMPLES_PER_THREAD
+    for start in range(thread_id * SAMPLES_PER_THREAD, num_samples, tile_stride):
+        end = min(start + SAMPLES_PER_THREAD, num_samples)
+
+        for _ in range(start, end):
+            # Generates 2 uniformly pseudo-randomly distributed
+            # numbers which represent a 2D point inside the unit
+            # circle.
+            x = xoroshiro128p_uniform_float32(rng_states, thread_id)
+            y = xoroshiro128p_uniform_float32(rng_states, thread_id)
+
+            # Checks if those points are inside the unit circle
+            # by finding the square magnitude of the vector,
+            # adding the result of the comparison rather than
+            # branching on it (so the threads in a warp don't
+            # diverge)
+            num_in_circle += np.int64(x * x + y * y < np.float32(1.0))
+
+    # Sums the block's counts, so there's only one atomic add
+    # per block rather than per thread
+    block_in_circle = block_sum(num_in_circle)
+
+    if cuda.threadIdx.x == 0:
+        cuda.atomic.add(counter, 0, block_in_circle)
+
+
+@cuda.jit(device=True)
+def _block_sum_shuffle(value):
+    """
+    Sums value over the threads in a block, returning the total
+    in the block's first thread
+    """
+    # Sums the values within each warp by shuffling them between
+    # the warp's registers, halving the number of lanes adding
+    # each step
+    lane = cuda.laneid
+    offset = WARP_SIZE // 2
+    while offset > 0:
+        value += cuda.shfl_down_sync(FULL_MASK, value, offset)
+        offset //= 2
+
+    # Then sums the warps' totals (via shared memory) in the
+    # block's first warp
+    warp_totals = cuda.shared.array(THREADS_PER_BLOCK // WARP_SIZE, dtype=np.int64)
+    warp = cuda.threadIdx.x // WARP_SIZE
+    if lane == 0:
+        warp_totals[warp] = value
+    cuda.syncthreads()
+
+    total = 0
+    if warp == 0:
+        if lane < THREADS_PER_BLOCK // WARP_SIZE:
+            total = warp_totals[lane]
+
+        offset = WARP_SIZE // 2
+        while offset > 0:
+            total += cuda.shfl_down_sync(FULL_MASK, total, offset)
+            offset //= 2
+
+    return total
+
+
+@cuda.jit(device=True)
+def _block_sum_shared(value):
+    """
+    Sums value over the threads in a block, returning the total
+    in the block's first thread (using only shared memory, which
+    the CUDA simulator supports, unlike warp shuffles)
+    """
+    # Halves the number of threads adding each step
+    totals = cuda.shared.array(THREADS_PER_BLOCK, dtype=np.int64)
+    tid = cuda.threadIdx.x
+    totals[tid] = value
+    cuda.syncthreads()
+
+    stride = THREADS_PER_BLOCK // 2
+    while stride > 0:
+        if tid < stride:
+            totals[tid] += totals[tid + stride]
+        cuda.syncthreads()
+        stride //= 2
+
+    return totals[0]
+
+
+# Sums each block's counts with warp shuffles only when asked to
+# with MONTE_CARLO_WARP_SHUFFLE=1, as that reduction hasn't been
+# run on a GPU yet (the CUDA simulator always uses the shared
+# memory one)
+if os.environ.get("MONTE_CARLO_WARP_SHUFFLE") == "1" and not config.ENABLE_CUDASIM:
+    block_sum = _block_sum_shuffle
+else:
+    block_sum = _block_sum_shared
+
+
+def calc_pi(num_samples=1e5, seed=12345):
+    """
+    Implements a parallel processing Monte-Carlo approach to
+    calculate pi (on a CUDA GPU using numba)
+
+    i.e. it creates looks at the positive quadrant of a unit
+    circle in a unit square and each loop checks whether a
+    normal uniformly randomly generated 2d point is inside
+    the circle or outside of it, and then uses the ratio of
+    the number of points in the circle to the total amount
+    of points sampled to get a value of pi
+
+    num_samples = Specifies how many data points are sampled
+    seed        = Specifies the random number generator's
+                  so that the results are repeatable and
+                  seed reproducable
+    """
+    n = int(num_samples)
+
+    # Launches enough blocks for each thread to take
+    # SAMPLES_PER_THREAD samples, up to MAX_BLOCKS
+    num_tiles = -(-n // SAMPLES_PER_THREAD)
+    num_blocks = min(MAX_BLOCKS, -(-num_tiles // THREADS_PER_BLOCK))
+    num_threads = num_blocks * THREADS_PER_BLOCK
+
+    # Sets the RNG's seed, giving each thread its own stream
+    rng_states = create_xoroshiro128p_states(num_threads, seed=seed)
+
+    # Stores the amount of points in the circle on the GPU
+    counter = cuda.to_device(np.zeros(1, dtype=np.int64))
+
+    count_inside_kernel[num_blocks, THREADS_PER_BLOCK](rng_states, n, counter)
+
+    # Uses the ratio of points in the unit circle to total
+    # number of points to get a value for pi
+    pi = 4 * counter.copy_to_host()[0] / num_samples
+
+    return pi
+
+
+def display_difference(original_value, new_value):
+    diff = new_value - original_value
+    print(f"Absolute difference   = {diff:.2e}")
+    percentage_diff = diff / original_value
+    print(f"Percentage difference = {percentage_diff:.5%}")
+
+
+def output_results(pi, num_samples, seed, tilde_length=60):
+    print("Calculating pi using a Monte-Carlo approach:")
+    print("~" * tilde_length)
+    print("Initial variables:")
+    print(f"Max number of samples = {num_samples:,.0f}")
+    print(f"RNG seed              = {seed:,}")
+    print("~" * tilde_length)
+    print(f"Actual value of pi = {np.pi}\n")
+    print(f"Final calculated value of pi = {pi}")
+    print("Difference between pi and calculated value of pi:")
+    display_difference(np.pi, pi)
+
+    print("~" * tilde_length)
+
+
+@unittest.skipUnless(cuda.is_available(), "No CUDA GPU is available")
+class Test_Pi_Calculation(unittest.TestCase):
+    """
+    This class contains the unit tests (these can be run
+    without a GPU by setting NUMBA_ENABLE_CUDASIM=1)
+    """
+
+    def test_calc_pi_basic(self):
+        """
+        A basic test to see that the returned values of pi
+        are outputting values in the expected range
+        """
+        pi = calc_pi(num_samples=1000, seed=42)
+
+        self.assertTrue(2.5 < pi < 4.0)
+
+    def test_calc_pi_with_seed(self):
+        """
+        Tests that calc_pi returns consistent results with same seed
+        """
+        pi1 = calc_pi(num_samples=1000, seed=123)
+        pi2 = calc_pi(num_samples=1000, seed=123)
+
+        self.assertEqual(pi1, pi2)
+
+    @unittest.skipIf(
+        config.ENABLE_CUDASIM, "The CUDA simulator doesn't support warp shuffles"
+    )
+    def test_block_sum_shuffle(self):
+        """
+        Tests that the warp shuffle reduction sums each block's
+        values the same as the shared memory one (this needs a
+        GPU, so it's what to run before making it the default)
+        """
+
+        @cuda.jit
+        def sum_kernel(values, totals):
+            value = values[cuda.grid(1)]
+            shuffle_total = _block_sum_shuffle(value)
+            shared_total = _block_sum_shared(value)
+            if cuda.threadIdx.x == 0:
+                totals[cuda.blockIdx.x, 0] = shuffle_total
+                totals[cuda.blockIdx.x, 1] = shared_total
+
+        values = np.arange(3 * THREADS_PER_BLOCK, dtype=np.int64) ** 2
+        totals = np.zeros((3, 2), dtype=np.int64)
+        sum_kernel[3, THREADS_PER_BLOCK](values, totals)
+
+        expected = values.reshape(3, THREADS_PER_BLOCK).sum(axis=1)
+        np.testing.assert_array_equal(totals[:, 0], expected)
+        np.testing.assert_array_equal(totals[:, 1], expected)
+
+
+if __name__ == "__main__":
+    """
+    Inputs:
+    num_samples = Specifies how many data points are sampled.
+    seed        = Specifies the random number generator's seed
+                  so that the results are repeatable and
+                  reproducable
+    """
+    num_samples = 1e5
+    seed = 12345
+
+    start = time.time()
+    pi = calc_pi(num_samples=num_samples, seed=seed)
+    print(f"Elapsed (with compilation) = {time.time() - start:.4f} s")
+
+    start = time.time()
+    pi = calc_pi(num_samples=num_samples, seed=seed)
+    print(f"Elapsed (without compilation) = {time.time() - start:.4f} s")
+
+    # Outputs the results to the console
+    output_results(pi, num_samples, seed)
+
+    # Run the unit tests (only when asked to with --test, so
+    # that benchmarking runs don't redo the work for every test)
+    if "--test" in sys.argv:
+        sys.argv.remove("--test")
+        print("\nRunning unit tests...")
+        unittest.main()
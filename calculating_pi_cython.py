@@ -0,0 +1,113 @@
+import numpy as np
+import unittest
+import time
+
+# Built with: python setup.py build_ext --inplace
+import calc_pi_cy
+
+
+def calc_pi(num_samples=1e5, seed=12345, pi_collection_rate=1e3):
+    """
+    Implements a serial processing Monte-Carlo approach to
+    calculate pi (using an ahead-of-time compiled Cython
+    kernel, so there's no JIT compilation and it can safely be
+    run under mpi4py)
+
+    i.e. it creates looks at the positive quadrant of a unit
+    circle in a unit square and each loop checks whether a
+    normal uniformly randomly generated 2d point is inside
+    the circle or outside of it, and then uses the ratio of
+    the number of points in the circle to the total amount
+    of points sampled to get a value of pi
+
+    num_samples = Specifies how many data points are sampled
+    seed        = Specifies the random number generator's
+                  so that the results are repeatable and
+                  seed reproducable
+    pi_collection_rate = The amount of iterations between
+                  storing the current value of pi
+    """
+    return calc_pi_cy.calc_pi(num_samples, seed, pi_collection_rate)
+
+
+def display_difference(original_value, new_value):
+    diff = new_value - original_value
+    print(f"Absolute difference   = {diff:.2e}")
+    percentage_diff = diff / original_value
+    print(f"Percentage difference = {percentage_diff:.5%}")
+
+
+def output_results(pi, num_samples, seed, tilde_length=60):
+    print("Calculating pi using a Monte-Carlo approach:")
+    print("~" * tilde_length)
+    print("Initial variables:")
+    print(f"Max number of samples = {num_samples:,.0f}")
+    print(f"RNG seed              = {seed:,}")
+    print("~" * tilde_length)
+    print(f"Actual value of pi = {np.pi}\n")
+    print(f"Final calculated value of pi = {pi}")
+    print("Difference between pi and calculated value of pi:")
+    display_difference(np.pi, pi)
+
+    print("~" * tilde_length)
+
+
+class Test_Pi_Calculation(unittest.TestCase):
+    """
+    This class contains the unit tests
+    """
+
+    def test_calc_pi_basic(self):
+        """
+        A basic test to see that the returned values of pi
+        are outputting values in the expected range
+        """
+        pi, pi_values = calc_pi(num_samples=1000, seed=42)
+
+        self.assertTrue(2.5 < pi < 4.0)
+        self.assertEqual(len(pi_values), 1)
+
+    def test_calc_pi_with_seed(self):
+        """
+        Tests that calc_pi returns consistent results with same seed
+        """
+        pi1, _ = calc_pi(num_samples=1000, seed=123)
+        pi2, _ = calc_pi(num_samples=1000, seed=123)
+
+        self.assertEqual(pi1, pi2)
+
+    def test_calc_pi_collection_rate(self):
+        """
+        Tests that pi_values has correct length based on collection rate
+        """
+        _, pi_values = calc_pi(num_samples=10000, pi_collection_rate=500)
+
+        self.assertEqual(len(pi_values), 10000 // 500)
+
+
+if __name__ == "__main__":
+    """
+    Inputs:
+    num_samples = Specifies how many data points are sampled.
+    seed        = Specifies the random number generator's seed
+                  so that the results are repeatable and
+                  reproducable
+    pi_collection_rate = The amount of samples between storing
+                         the current value of calculated pi
+    """
+    num_samples = 1e5
+    seed = 12345
+    pi_collection_rate = 1e3
+
+    start = time.time()
+    pi, pi_values = calc_pi(
+        num_samples=num_samples, seed=seed, pi_collection_rate=pi_collection_rate
+    )
+    print(f"Elapsed = {time.time() - start:.4f} s")
+
+    # Outputs the results to the console
+    output_results(pi, num_samples, seed)
+
+    # Run the unit tests
+    print("\nRunning unit tests...")
+    unittest.main()
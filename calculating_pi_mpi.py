@@ -1,7 +1,46 @@
 import numpy as np
+import os
+import sys
 import unittest
 from mpi4py import MPI
-import time
+
+# The number of samples which are generated and checked at a
+# time by each rank
+CHUNK_SIZE = 1 << 20
+
+
+def count_inside(rng, num_points):
+    """
+    Counts how many of num_points uniformly pseudo-randomly
+    generated 2d points are inside the unit circle, returning
+    the count as a 1 element array ready to be sent with MPI
+    """
+    # Scratch buffers which are reused by every chunk, so that
+    # only CHUNK_SIZE points are held in memory at any one time
+    chunk_size = max(1, min(CHUNK_SIZE, num_points))
+    xy = np.empty((chunk_size, 2), dtype=np.float32)
+    d2 = np.empty(chunk_size, dtype=np.float32)
+    inside = np.empty(chunk_size, dtype=bool)
+
+    num_in_circle = 0
+
+    for start in range(0, num_points, chunk_size):
+        m = min(chunk_size, num_points - start)
+
+        # Generates the chunk's 2d points in one go (in single
+        # precision, which is plenty for this test and halves the
+        # memory used) straight into the buffer
+        rng.random(dtype=np.float32, out=xy[:m])
+
+        # Counts the points inside the unit circle by finding the
+        # square magnitude of each vector (there's no point finding
+        # the sqrt as numbers < 1 will remain < 1, and numbers > 1
+        # will remain > 1)
+        np.einsum("ij,ij->i", xy[:m], xy[:m], out=d2[:m])
+        np.less(d2[:m], 1.0, out=inside[:m])
+        num_in_circle += np.count_nonzero(inside[:m])
+
+    return np.array([num_in_circle], dtype=np.int64)
 
 
 def calc_pi(num_samples=1e5, seed=12345):
@@ -20,6 +59,9 @@ def calc_pi(num_samples=1e5, seed=12345):
     seed        = Specifies the random number generator's
                   so that the results are repeatable and
                   seed reproducable
+
+    Returns the calculated value of pi (on every rank) and
+    the rank of the process
     """
     comm = MPI.COMM_WORLD
     rank = comm.Get_rank()
@@ -33,28 +75,41 @@ def calc_pi(num_samples=1e5, seed=12345):
     if rank == 0:
         samples_per_proc += int(num_samples) % size
 
-    # Sets a unique RNG's seed to each rank
-    np.random.seed(seed + rank)
+    # Gives each rank its own independent RNG stream spawned
+    # from the seed (using seed + rank instead can give ranks
+    # correlated streams)
+    child_seed = np.random.SeedSequence(seed).spawn(size)[rank]
+    rng = np.random.default_rng(child_seed)
 
-    # Sets the initial amount of points in the circle to 0
-    num_in_circle = 0
+    # Splits this rank's samples into two halves, so that the
+    # first half can be combined across the ranks while the
+    # second half is still being calculated
+    first_half = samples_per_proc // 2
+    second_half = samples_per_proc - first_half
 
-    for i in range(samples_per_proc):
-        # Checks if the randomly generated 2d point is inside
-        # the unit circle finding the magnitude of the vector
-        if np.linalg.norm(np.random.rand(2)) < 1:
-            num_in_circle += 1
+    num_in_circle_a = count_inside(rng, first_half)
 
-    # Combines all processes to a value on rank 0
-    total_in_circle = comm.reduce(num_in_circle, op=MPI.SUM, root=0)
+    # Starts combining the first half's counts to a value on every
+    # rank (using the buffer based Iallreduce rather than pickling
+    # an int), which doesn't block this rank
+    total_in_circle_a = np.empty_like(num_in_circle_a)
+    request = comm.Iallreduce(
+        [num_in_circle_a, MPI.INT64_T], [total_in_circle_a, MPI.INT64_T], op=MPI.SUM
+    )
 
-    if rank == 0:
-        pi = 4 * total_in_circle / num_samples
-        return pi, rank
-    else:
-        return None, rank
+    num_in_circle_b = count_inside(rng, second_half)
+    total_in_circle_b = np.empty_like(num_in_circle_b)
+    request.Wait()
+
+    # Combines the second half's counts in the same way
+    comm.Allreduce(
+        [num_in_circle_b, MPI.INT64_T], [total_in_circle_b, MPI.INT64_T], op=MPI.SUM
+    )
+    total_in_circle = total_in_circle_a + total_in_circle_b
 
-    return pi
+    pi = 4 * total_in_circle[0] / num_samples
+
+    return pi, rank
 
 
 def output_results(pi, num_samples, seed, tilde_length=50):
@@ -84,21 +139,19 @@ class Test_Pi_Calculation(unittest.TestCase):
         A basic test to see that the returned values of pi
         are outputting values in the expected range
         """
-        pi, rank = calc_pi(num_samples=1000, seed=42)
+        pi, _ = calc_pi(num_samples=1000, seed=42)
 
-        if rank == 0:
-            self.assertTrue(2.5 < pi < 4.0)
+        self.assertTrue(2.5 < pi < 4.0)
 
     def test_calc_pi_with_seed(self):
         """
         Tests that calc_pi returns consistent results with same seed
         """
-        pi1, rank1 = calc_pi(num_samples=1000, seed=123)
-        pi2, rank2 = calc_pi(num_samples=1000, seed=123)
+        pi1, _ = calc_pi(num_samples=1000, seed=123)
+        pi2, _ = calc_pi(num_samples=1000, seed=123)
 
-        if rank1 == 0 and rank2 == 0:
-            # Testing that all values of returned pi are equal
-            self.assertEqual(pi1, pi2)
+        # Testing that all values of returned pi are equal
+        self.assertEqual(pi1, pi2)
 
 
 if __name__ == "__main__":
@@ -112,17 +165,28 @@ if __name__ == "__main__":
     num_samples = 1e5
     seed = 12345
 
-    start = time.time()
+    start = MPI.Wtime()
     pi, rank = calc_pi(num_samples=num_samples, seed=seed)
 
     if rank == 0:
-        print(f"Elapsed = {time.time() - start:.4f} s")
+        print(f"Elapsed = {MPI.Wtime() - start:.4f} s")
         # Outputs the results to the console
         output_results(pi, num_samples, seed)
 
-        # Run the unit tests
-        print("\nRunning unit tests...")
-    unittest.main()
+    # Run the unit tests (only when asked to with --test, so
+    # that benchmarking runs don't redo the work for every test).
+    # Every rank has to run them as calc_pi needs all the ranks,
+    # but only rank 0 reports the results
+    if "--test" in sys.argv:
+        sys.argv.remove("--test")
+
+        if rank == 0:
+            print("\nRunning unit tests...")
+            stream = sys.stderr
+        else:
+            stream = open(os.devnull, "w")
+
+        unittest.main(testRunner=unittest.TextTestRunner(stream=stream))
 
     # Alternative unittest syntaxes #
 
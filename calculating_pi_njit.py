@@ -1,10 +1,31 @@
 import numpy as np
+import sys
 import unittest
 from numba import njit
 import time
 
+from _njit_kernel import BLOCK_SIZE, calc_pi_kernel
+
+try:
+    # Built with: python setup.py build_ext --inplace
+    from calc_pi_aot import calc_pi_kernel as _calc_pi_aot_kernel
+except ImportError:
+    _calc_pi_aot_kernel = None
+
+# Compiles the kernel with an explicit signature, so it's
+# compiled (or loaded from the cache) once on import rather than
+# on the first call (and with NumPy's error model, so there are
+# no checks for dividing by zero)
+_calc_pi_kernel = njit(
+    "float64(int64, int64)",
+    cache=True,
+    parallel=True,
+    fastmath=True,
+    boundscheck=False,
+    error_model="numpy",
+)(calc_pi_kernel)
+
 
-@njit
 def calc_pi(num_samples=1e5, seed=12345):
     """
     Implements a parallel processing Monte-Carlo approach to
@@ -17,6 +38,12 @@ def calc_pi(num_samples=1e5, seed=12345):
     the number of points in the circle to the total amount
     of points sampled to get a value of pi
 
+    The samples are split into blocks which are shared out
+    between the available threads, with each block seeding
+    its thread's RNG from a SplitMix64 mix of seed and the
+    block's index, so the results don't depend on the number
+    of threads
+
     num_samples = Specifies how many data points are sampled
     seed        = Specifies the random number generator's
                   so that the results are repeatable and
@@ -24,21 +51,27 @@ def calc_pi(num_samples=1e5, seed=12345):
     pi_collection_rate = The amount of iterations between
                   storing the current value of pi
     """
-    # Sets the RNG's seed
-    np.random.seed(seed)
+    return _calc_pi_kernel(int(num_samples), seed)
+
 
-    # Sets the initial amount of points in the circle to 0
-    num_in_circle = 0
+def calc_pi_aot(num_samples=1e5, seed=12345):
+    """
+    Calculates pi the same way as calc_pi, but using the version
+    of the kernel ahead-of-time compiled by setup.py, so numba
+    never has to JIT compile anything
 
-    for i in range(1, int(num_samples) + 1):
-        # Checks if the randomly generated 2d point is inside
-        # the unit circle finding the magnitude of the vector
-        if np.linalg.norm(np.random.rand(2)) < 1:
-            num_in_circle += 1
+    (numba.pycc can't compile parallel loops, so this runs on a
+    single thread, but gives exactly the same results)
 
-    pi = 4 * num_in_circle / num_samples
+    num_samples = Specifies how many data points are sampled
+    seed        = Specifies the random number generator's
+                  so that the results are repeatable and
+                  seed reproducable
+    """
+    if _calc_pi_aot_kernel is None:
+        raise ImportError("calc_pi_aot needs calc_pi_aot to be built")
 
-    return pi
+    return _calc_pi_aot_kernel(int(num_samples), seed)
 
 
 def display_difference(original_value, new_value):
@@ -86,6 +119,34 @@ class Test_Pi_Calculation(unittest.TestCase):
 
         self.assertEqual(pi1, pi2)
 
+    def test_calc_pi_neighbouring_seeds(self):
+        """
+        Tests that neighbouring seeds don't share their blocks'
+        RNG streams (which seeding each block with seed + its
+        index would do, making the 2 block count below exactly
+        the sum of the 1 block ones)
+        """
+        hits_two_blocks = round(
+            calc_pi(num_samples=2 * BLOCK_SIZE, seed=123) / 4 * 2 * BLOCK_SIZE
+        )
+        hits_seed = round(calc_pi(num_samples=BLOCK_SIZE, seed=123) / 4 * BLOCK_SIZE)
+        hits_next_seed = round(
+            calc_pi(num_samples=BLOCK_SIZE, seed=124) / 4 * BLOCK_SIZE
+        )
+
+        self.assertNotEqual(hits_two_blocks, hits_seed + hits_next_seed)
+
+    @unittest.skipIf(_calc_pi_aot_kernel is None, "calc_pi_aot hasn't been built")
+    def test_calc_pi_aot(self):
+        """
+        Tests that the ahead-of-time compiled kernel gives the
+        same results as the JIT compiled one
+        """
+        pi1 = calc_pi(num_samples=100000, seed=123)
+        pi2 = calc_pi_aot(num_samples=100000, seed=123)
+
+        self.assertEqual(pi1, pi2)
+
 
 if __name__ == "__main__":
     """
@@ -98,20 +159,21 @@ if __name__ == "__main__":
     num_samples = 1e5
     seed = 12345
 
+    # (calc_pi has already been compiled on import, so this
+    # doesn't include the compilation time)
     start = time.time()
     pi = calc_pi(num_samples=num_samples, seed=seed)
-    print(f"Elapsed (with compilation) = {time.time() - start:.4f} s")
-
-    start = time.time()
-    pi = calc_pi(num_samples=num_samples, seed=seed)
-    print(f"Elapsed (without compilation) = {time.time() - start:.4f} s")
+    print(f"Elapsed = {time.time() - start:.4f} s")
 
     # Outputs the results to the console
     output_results(pi, num_samples, seed)
 
-    # Run the unit tests
-    print("\nRunning unit tests...")
-    unittest.main()
+    # Run the unit tests (only when asked to with --test, so
+    # that benchmarking runs don't redo the work for every test)
+    if "--test" in sys.argv:
+        sys.argv.remove("--test")
+        print("\nRunning unit tests...")
+        unittest.main()
 
     # Alternative unittest syntaxes #
 
@@ -2,8 +2,20 @@ import numpy as np
 import unittest
 import time
 
+try:
+    # Intel's MKL random number generators, which are vectorised
+    # for each instruction set
+    import mkl_random
+except ImportError:
+    mkl_random = None
 
-def calc_pi(num_samples=1e5, seed=12345):
+# The number of samples which are generated and checked at a
+# time (small enough to stay in the cache, but big enough that
+# the per-chunk overhead doesn't matter)
+CHUNK_SIZE = 1 << 18
+
+
+def calc_pi(num_samples=1e5, seed=12345, dtype=np.float32, use_mkl=False):
     """
     Implements a serial processing Monte-Carlo approach to
     calculate pi
@@ -15,30 +27,267 @@ def calc_pi(num_samples=1e5, seed=12345):
     the number of points in the circle to the total amount
     of points sampled to get a value of pi
 
+    num_samples = Specifies how many data points are sampled
+    seed        = Specifies the random number generator's
+                  so that the results are repeatable and
+                  seed reproducable
+    dtype       = Specifies the precision of the points
+                  (single precision is plenty for this test,
+                  and halves the memory each chunk uses)
+    use_mkl     = Specifies whether to draw the points with MKL
+                  (needs mkl_random), which is faster but gives
+                  different points for the same seed, and
+                  allocates a new double precision array for
+                  each chunk
+    """
+    if use_mkl and mkl_random is None:
+        raise ImportError("calc_pi's use_mkl needs mkl_random to be installed")
+
+    # Sets the RNG's seed (uses MKL's MT2203 generator if asked
+    # to, or otherwise the PCG64DXSM generator, which is faster
+    # than the legacy np.random.seed Mersenne Twister and has
+    # better statistical properties than default_rng's PCG64)
+    if use_mkl:
+        rng = mkl_random.MKLRandomState(seed, brng="MT2203")
+    else:
+        rng = np.random.Generator(np.random.PCG64DXSM(seed))
+
+    n = int(num_samples)
+
+    # Sets the initial amount of points in the circle to 0
+    num_in_circle = 0
+
+    # Scratch buffers which are reused by every chunk, so that
+    # only CHUNK_SIZE points are held in memory at any one time
+    # (the x and y coordinates are kept in separate arrays, so
+    # each one is contiguous)
+    chunk_size = max(1, min(CHUNK_SIZE, n))
+    x = np.empty(chunk_size, dtype=dtype)
+    y = np.empty(chunk_size, dtype=dtype)
+
+    # Takes a number of samples = num_samples, a chunk at a time
+    for start in range(0, n, chunk_size):
+        m = min(chunk_size, n - start)
+
+        # Generates the chunk's 2d points in one go rather than
+        # one at a time, as the per-call overhead dominates
+        # (MKL can't draw into an existing array, so it allocates
+        # a new double precision array of both coordinates for
+        # each chunk, which is then rounded to dtype in the
+        # buffers)
+        if use_mkl:
+            xy = rng.random_sample(2 * m)
+            x[:m] = xy[:m]
+            y[:m] = xy[m:]
+        else:
+            rng.random(dtype=dtype, out=x[:m])
+            rng.random(dtype=dtype, out=y[:m])
+
+        # Counts the points inside the unit circle by finding the
+        # square magnitude of each vector in place (there's no
+        # point finding the sqrt as numbers < 1 will remain < 1,
+        # and numbers > 1 will remain > 1)
+        np.multiply(x[:m], x[:m], out=x[:m])
+        np.multiply(y[:m], y[:m], out=y[:m])
+        np.add(x[:m], y[:m], out=x[:m])
+        num_in_circle += int(np.count_nonzero(x[:m] < 1.0))
+
+    pi = 4 * num_in_circle / num_samples
+
+    return pi
+
+
+def calc_pi_running(
+    num_samples=1e5, seed=12345, pi_collection_rate=1e3, dtype=np.float32
+):
+    """
+    Calculates pi the same way as calc_pi (without MKL), while
+    also storing the value of pi after every pi_collection_rate
+    samples, by counting the points in the circle for each
+    interval of a chunk at once rather than point by point
+
     num_samples = Specifies how many data points are sampled
     seed        = Specifies the random number generator's
                   so that the results are repeatable and
                   seed reproducable
     pi_collection_rate = The amount of iterations between
                   storing the current value of pi
+    dtype       = Specifies the precision of the points
+
+    Returns the final value of pi and the stored values of pi
     """
-    # Sets the RNG's seed
-    np.random.seed(seed)
+    rng = np.random.Generator(np.random.PCG64DXSM(seed))
+
+    n = int(num_samples)
+    step = int(pi_collection_rate)
+
+    # Stores the amount of points in the circle for each interval
+    # between storing the current value of pi (the final entry
+    # is for any samples after the last interval)
+    interval_hits = np.zeros(n // step + 1, dtype=np.int64)
+
+    # Scratch buffers which are reused by every chunk, so that
+    # only CHUNK_SIZE points are held in memory at any one time
+    chunk_size = max(1, min(CHUNK_SIZE, n))
+    x = np.empty(chunk_size, dtype=dtype)
+    y = np.empty(chunk_size, dtype=dtype)
+    inside = np.empty(chunk_size, dtype=bool)
+
+    for start in range(0, n, chunk_size):
+        m = min(chunk_size, n - start)
+
+        rng.random(dtype=dtype, out=x[:m])
+        rng.random(dtype=dtype, out=y[:m])
+
+        np.multiply(x[:m], x[:m], out=x[:m])
+        np.multiply(y[:m], y[:m], out=y[:m])
+        np.add(x[:m], y[:m], out=x[:m])
+        np.less(x[:m], 1.0, out=inside[:m])
+
+        # Splits the chunk wherever a new interval starts (plus at
+        # its start, which may be part way through an interval),
+        # and counts the points in the circle in each part
+        boundaries = np.arange(-start % step, m, step)
+        if len(boundaries) == 0 or boundaries[0] != 0:
+            boundaries = np.r_[0, boundaries]
+        counts = np.add.reduceat(inside[:m], boundaries, dtype=np.int64)
+
+        first_interval = start // step
+        interval_hits[first_interval : first_interval + len(counts)] += counts
+
+    # Stores the value of pi after every pi_collection_rate
+    # samples using the running total of points in the circle
+    num_pi_values = n // step
+    pi_values = (
+        4
+        * np.cumsum(interval_hits[:num_pi_values])
+        / (np.arange(1, num_pi_values + 1) * step)
+    )
+
+    pi = 4 * interval_hits.sum() / num_samples
+
+    return pi, pi_values
+
+
+def calc_pi_stratified(num_samples=1e5, seed=12345, dtype=np.float32):
+    """
+    Implements a serial processing Monte-Carlo approach to
+    calculate pi using stratified sampling
+
+    i.e. it works the same way as calc_pi, but splits the unit
+    square into a grid of equally sized cells and takes one
+    uniformly random point in each, so the points can't bunch
+    up and the calculated value of pi has a much lower
+    variance for the same number of samples
+
+    num_samples = Specifies how many data points are sampled
+                  (rounded down to a square number, as the grid
+                  has the same number of rows and columns)
+    seed        = Specifies the random number generator's
+                  so that the results are repeatable and
+                  seed reproducable
+    dtype       = Specifies the precision of the points
+    """
+    rng = np.random.Generator(np.random.PCG64DXSM(seed))
+
+    # The number of rows and columns of cells
+    m = int(np.sqrt(int(num_samples)))
 
     # Sets the initial amount of points in the circle to 0
     num_in_circle = 0
 
-    for i in range(1, int(num_samples) + 1):
-        # Checks if the randomly generated 2d point is inside
-        # the unit circle finding the magnitude of the vector
-        if np.linalg.norm(np.random.rand(2)) < 1:
-            num_in_circle += 1
+    # Scratch buffers which are reused by every chunk of rows,
+    # so that only about CHUNK_SIZE points are held in memory at
+    # any one time
+    rows_per_chunk = max(1, CHUNK_SIZE // m)
+    x = np.empty((min(rows_per_chunk, m), m), dtype=dtype)
+    y = np.empty((min(rows_per_chunk, m), m), dtype=dtype)
+    columns = np.arange(m, dtype=dtype)
+
+    for first_row in range(0, m, rows_per_chunk):
+        k = min(rows_per_chunk, m - first_row)
+        rows = np.arange(first_row, first_row + k, dtype=dtype)[:, np.newaxis]
+
+        # Generates a uniformly pseudo-randomly distributed point
+        # in each of the chunk's cells
+        rng.random(dtype=dtype, out=x[:k])
+        rng.random(dtype=dtype, out=y[:k])
+        np.add(x[:k], columns, out=x[:k])
+        np.add(y[:k], rows, out=y[:k])
+        np.multiply(x[:k], 1 / m, out=x[:k])
+        np.multiply(y[:k], 1 / m, out=y[:k])
+
+        # Counts the points inside the unit circle by finding the
+        # square magnitude of each vector
+        np.multiply(x[:k], x[:k], out=x[:k])
+        np.multiply(y[:k], y[:k], out=y[:k])
+        np.add(x[:k], y[:k], out=x[:k])
+        num_in_circle += int(np.count_nonzero(x[:k] < 1.0))
+
+    pi = 4 * num_in_circle / (m * m)
+
+    return pi
 
-    pi = 4 * num_in_circle / num_samples
+
+def calc_pi_antithetic(num_samples=1e5, seed=12345, dtype=np.float32):
+    """
+    Implements a serial processing Monte-Carlo approach to
+    calculate pi using antithetic variates
+
+    i.e. it works the same way as calc_pi, but only half of
+    the points are random, with the other half being their
+    reflections (1 - x, 1 - y), which are less likely to be
+    inside the circle when the originals are, so the errors
+    partly cancel and the calculated value of pi has a lower
+    variance for the same number of samples
+
+    num_samples = Specifies how many data points are sampled
+                  (rounded up to an even number)
+    seed        = Specifies the random number generator's
+                  so that the results are repeatable and
+                  seed reproducable
+    dtype       = Specifies the precision of the points
+    """
+    rng = np.random.Generator(np.random.PCG64DXSM(seed))
+
+    num_pairs = -(-int(num_samples) // 2)
+
+    # Sets the initial amount of points in the circle to 0
+    num_in_circle = 0
+
+    # Scratch buffers which are reused by every chunk, so that
+    # only CHUNK_SIZE points are held in memory at any one time
+    chunk_pairs = max(1, min(CHUNK_SIZE // 2, num_pairs))
+    xy = np.empty((2 * chunk_pairs, 2), dtype=dtype)
+    d2 = np.empty(2 * chunk_pairs, dtype=dtype)
+
+    for start in range(0, num_pairs, chunk_pairs):
+        m = min(chunk_pairs, num_pairs - start)
+
+        _draw_antithetic(rng, xy[: 2 * m])
+
+        # Counts the points inside the unit circle by finding the
+        # square magnitude of each vector
+        np.einsum("ij,ij->i", xy[: 2 * m], xy[: 2 * m], out=d2[: 2 * m])
+        num_in_circle += int(np.count_nonzero(d2[: 2 * m] < 1.0))
+
+    pi = 4 * num_in_circle / (2 * num_pairs)
 
     return pi
 
 
+def _draw_antithetic(rng, out):
+    """
+    Fills the first half of the (2n, 2) array out with uniformly
+    pseudo-randomly distributed 2d points, and the second half
+    with their antithetic pairs (1 - x, 1 - y)
+    """
+    n = len(out) // 2
+
+    rng.random(dtype=out.dtype, out=out[:n])
+    np.subtract(1, out[:n], out=out[n:])
+
+
 def display_difference(original_value, new_value):
     diff = new_value - original_value
     print(f"Absolute difference   = {diff:.2e}")
@@ -84,6 +333,119 @@ class Test_Pi_Calculation(unittest.TestCase):
 
         self.assertEqual(pi1, pi2)
 
+    def test_calc_pi_precision(self):
+        """
+        Tests that calculating pi in single precision agrees with
+        double precision to within the Monte-Carlo error
+        """
+        pi32 = calc_pi(num_samples=1e7, seed=5, dtype=np.float32)
+        pi64 = calc_pi(num_samples=1e7, seed=5, dtype=np.float64)
+
+        self.assertAlmostEqual(pi32, pi64, delta=2e-3)
+
+    def test_calc_pi_running(self):
+        """
+        Tests that calc_pi_running stores the right values of pi
+        when the pi_collection_rate doesn't divide the chunks
+        """
+        global CHUNK_SIZE
+        original_chunk_size = CHUNK_SIZE
+
+        try:
+            CHUNK_SIZE = 777
+            pi, pi_values = calc_pi_running(
+                num_samples=10003, seed=3, pi_collection_rate=500
+            )
+            pi_calc_pi = calc_pi(num_samples=10003, seed=3)
+        finally:
+            CHUNK_SIZE = original_chunk_size
+
+        # Recreates the same points a chunk at a time
+        rng = np.random.Generator(np.random.PCG64DXSM(3))
+        inside = []
+        for start in range(0, 10003, 777):
+            m = min(777, 10003 - start)
+            x = rng.random(m, dtype=np.float32)
+            y = rng.random(m, dtype=np.float32)
+            inside.append(x * x + y * y < 1.0)
+        running_total = np.cumsum(np.concatenate(inside))
+
+        self.assertEqual(pi, 4 * running_total[-1] / 10003)
+        self.assertEqual(pi, pi_calc_pi)
+        np.testing.assert_allclose(
+            pi_values, 4 * running_total[499:10000:500] / np.arange(500, 10001, 500)
+        )
+
+    def test_calc_pi_mkl_missing(self):
+        """
+        Tests that calc_pi says mkl_random is needed when asked to
+        use MKL without it
+        """
+        global mkl_random
+        original_mkl_random = mkl_random
+
+        try:
+            mkl_random = None
+            with self.assertRaises(ImportError):
+                calc_pi(num_samples=1000, seed=123, use_mkl=True)
+        finally:
+            mkl_random = original_mkl_random
+
+    @unittest.skipIf(mkl_random is None, "mkl_random isn't installed")
+    def test_calc_pi_mkl(self):
+        """
+        Tests that calc_pi gives repeatable values of pi in the
+        expected range with and without MKL, and only uses MKL
+        when asked to
+        """
+        for use_mkl in (True, False):
+            pi1 = calc_pi(num_samples=1000, seed=123, use_mkl=use_mkl)
+            pi2 = calc_pi(num_samples=1000, seed=123, use_mkl=use_mkl)
+
+            self.assertTrue(2.5 < pi1 < 4.0)
+            self.assertEqual(pi1, pi2)
+
+        self.assertEqual(
+            calc_pi(num_samples=1000, seed=123),
+            calc_pi(num_samples=1000, seed=123, use_mkl=False),
+        )
+
+    def test_calc_pi_stratified(self):
+        """
+        Tests that the stratified values of pi are repeatable and
+        have a lower variance than the plain Monte-Carlo ones
+        """
+        pi1 = calc_pi_stratified(num_samples=10000, seed=123)
+        pi2 = calc_pi_stratified(num_samples=10000, seed=123)
+
+        self.assertTrue(2.5 < pi1 < 4.0)
+        self.assertEqual(pi1, pi2)
+
+        plain = [calc_pi(num_samples=10000, seed=seed) for seed in range(50)]
+        stratified = [
+            calc_pi_stratified(num_samples=10000, seed=seed) for seed in range(50)
+        ]
+
+        self.assertLess(np.var(stratified), np.var(plain))
+
+    def test_calc_pi_antithetic(self):
+        """
+        Tests that the antithetic pairs are reflections of the
+        random points, and that using them lowers the variance
+        of the calculated values of pi
+        """
+        xy = np.empty((10, 2), dtype=np.float32)
+        _draw_antithetic(np.random.default_rng(1), xy)
+        np.testing.assert_allclose(xy[5:], 1 - xy[:5])
+
+        plain = [calc_pi(num_samples=2000, seed=seed) for seed in range(100)]
+        antithetic = [
+            calc_pi_antithetic(num_samples=2000, seed=seed) for seed in range(100)
+        ]
+
+        self.assertTrue(2.5 < np.mean(antithetic) < 4.0)
+        self.assertLess(np.var(antithetic), np.var(plain))
+
 
 if __name__ == "__main__":
     """
@@ -26,13 +26,22 @@ def calc_pi(num_samples=1e5, seed=12345):
     # Sets the RNG's seed
     np.random.seed(seed)
 
+    n = int(num_samples)
+
     # Sets the initial amount of points in the circle to 0
     num_in_circle = 0
 
-    for i in range(1, int(num_samples) + 1):
-        # Checks if the randomly generated 2d point is inside
-        # the unit circle finding the magnitude of the vector
-        if np.linalg.norm(np.random.rand(2)) < 1:
+    for _ in range(n):
+        # Generates 2 uniformly pseudo-randomly distributed
+        # numbers which represent a 2D point inside the unit
+        # circle.
+        x, y = np.random.rand(2)
+
+        # Checks if those points are inside the unit circle
+        # by finding the square magnitude of the vector
+        # (there's no point finding the sqrt as numbers < 1
+        # will remain < 1, and numbers > 1 will remain > 1)
+        if x * x + y * y < 1:
             num_in_circle += 1
 
     pi = 4 * num_in_circle / num_samples
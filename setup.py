@@ -0,0 +1,65 @@
+"""
+Builds the compiled Monte-Carlo kernels in place with:
+    python setup.py build_ext --inplace
+
+The C and Cython kernels can also be built with profile guided
+optimisation, by building them with MONTE_CARLO_PGO=generate,
+running a training workload, and then rebuilding them with
+MONTE_CARLO_PGO=use (see getting_started.rst)
+"""
+
+import os
+
+from setuptools import Extension, setup
+from Cython.Build import cythonize
+
+try:
+    from numba.pycc import CC
+except ImportError:
+    CC = None
+
+# Where the profiles from a MONTE_CARLO_PGO=generate build are
+# written to when it's run, and read from by a MONTE_CARLO_PGO=use
+# build
+PGO_DIR = os.path.abspath(os.path.join("build", "pgo"))
+
+pgo = os.environ.get("MONTE_CARLO_PGO", "")
+if pgo == "generate":
+    pgo_args = ["-flto", f"-fprofile-generate={PGO_DIR}"]
+elif pgo == "use":
+    pgo_args = ["-flto", f"-fprofile-use={PGO_DIR}", "-fprofile-correction"]
+elif pgo == "":
+    pgo_args = []
+else:
+    raise ValueError("MONTE_CARLO_PGO must be generate or use")
+
+extensions = [
+    Extension(
+        "calc_pi_cy",
+        ["calc_pi_cy.pyx"],
+        extra_compile_args=["-O3", "-march=native", "-ffast-math"] + pgo_args,
+        extra_link_args=pgo_args,
+    ),
+    Extension(
+        "_monte_kernel",
+        ["_monte_kernel.c"],
+        extra_compile_args=["-O3", "-march=native"] + pgo_args,
+        extra_link_args=pgo_args,
+    ),
+]
+
+ext_modules = cythonize(extensions)
+
+# Ahead-of-time compiles the njit kernel (if numba is installed),
+# so it can be used without numba's JIT compiler
+if CC is not None:
+    from _njit_kernel import calc_pi_kernel
+
+    cc = CC("calc_pi_aot")
+    cc.export("calc_pi_kernel", "f8(i8, i8)")(calc_pi_kernel)
+    ext_modules.append(cc.distutils_extension())
+
+setup(
+    name="Monte-Carlo-pi",
+    ext_modules=ext_modules,
+)